@@ -3,23 +3,29 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+from dataclasses import asdict
+from typing import List, Optional
+import orjson
 import websockets
 
-from polarmanager.core.models import Event
+from polarmanager.core.models import LocalEvent
 
 log = logging.getLogger("polarmanager.polarsystems")
 
+_SEND_BATCH_MAX = 64
+
 
 class PolarSystemsClient:
     def __init__(self, url: str, token: str) -> None:
         self.url = url
         self.token = token
         self._stop = asyncio.Event()
+        self._pending: List[LocalEvent] = []
 
     def stop(self) -> None:
         self._stop.set()
 
-    async def loop(self, event_q: "asyncio.Queue[Event]") -> None:
+    async def loop(self, event_q: "asyncio.Queue[LocalEvent]") -> None:
         headers = {"Authorization": f"Bearer {self.token}"}
 
         while not self._stop.is_set():
@@ -34,14 +40,26 @@ class PolarSystemsClient:
                 log.warning("disconnected, retrying")
                 await asyncio.sleep(2.0)
 
-    async def _run_session(self, ws, event_q: "asyncio.Queue[Event]") -> None:
+    async def _run_session(
+        self, ws, event_q: "asyncio.Queue[LocalEvent]"
+    ) -> None:
         async def sender():
+            batch = self._pending
             while True:
-                thing = await event_q.get()
-                try:
-                    await ws.send(thing.model_dump_json())
-                finally:
+                if not batch:
+                    batch.append(await event_q.get())
+                    event_q.task_done()
+                while len(batch) < _SEND_BATCH_MAX:
+                    try:
+                        batch.append(event_q.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
                     event_q.task_done()
+                payload = _encode(batch)
+                if payload is not None:
+                    # only a failed send keeps the batch pending for the next session
+                    await ws.send(payload)
+                batch.clear()
 
         send_task = asyncio.create_task(sender())
         try:
@@ -50,4 +68,18 @@ class PolarSystemsClient:
                 _ = msg
                 # här kommer commands in senare
         finally:
-            send_task.cancel()
\ No newline at end of file
+            send_task.cancel()
+
+
+def _encode(batch: List[LocalEvent]) -> Optional[str]:
+    try:
+        return orjson.dumps(batch[0] if len(batch) == 1 else batch).decode()
+    except TypeError as e:
+        log.warning("orjson could not encode %d events (%s), using json", len(batch), e)
+
+    try:
+        thing = [asdict(ev) for ev in batch]
+        return json.dumps(thing[0] if len(thing) == 1 else thing, default=str)
+    except (TypeError, ValueError):
+        log.exception("dropping %d unencodable events: %r", len(batch), batch)
+        return None
@@ -4,6 +4,12 @@ import asyncio
 import os
 from typing import Awaitable, Callable, Dict, List, Optional
 
+_READ_CHUNK = 65536
+_STREAM_LIMIT = 1 << 20
+
+# snapshot taken at import; later changes to os.environ are not picked up
+_BASE_ENV = dict(os.environ)
+
 
 class ProcessAdapter:
     def __init__(self) -> None:
@@ -19,8 +25,7 @@ class ProcessAdapter:
         if self.proc and self.proc.returncode is None:
             raise RuntimeError("process already running")
 
-        thing = os.environ.copy()
-        thing.update(env)
+        thing = {**_BASE_ENV, **env}
 
         self.proc = await asyncio.create_subprocess_exec(
             *cmd,
@@ -28,6 +33,7 @@ class ProcessAdapter:
             env=thing,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
+            limit=_STREAM_LIMIT,
         )
 
         asyncio.create_task(self._read_stdout(on_line))
@@ -36,12 +42,27 @@ class ProcessAdapter:
         if not self.proc or not self.proc.stdout:
             return
 
+        buf = bytearray()
         while True:
-            thing = await self.proc.stdout.readline()
-            if not thing:
+            chunk = await self.proc.stdout.read(_READ_CHUNK)
+            if not chunk:
                 break
-            line = thing.decode("utf-8", errors="replace").rstrip("\n")
-            await on_line(line)
+            buf += chunk
+
+            end = buf.rfind(b"\n")
+            if end != -1:
+                lines = buf[:end].split(b"\n")
+                del buf[: end + 1]
+                for thing in lines:
+                    await on_line(thing.decode("utf-8", errors="replace"))
+
+            # no newline in sight (progress bars, binary dumps): flush as a line
+            if len(buf) >= _STREAM_LIMIT:
+                await on_line(buf.decode("utf-8", errors="replace"))
+                buf.clear()
+
+        if buf:
+            await on_line(buf.decode("utf-8", errors="replace"))
 
     async def stop(self) -> None:
         if not self.proc or self.proc.returncode is not None:
@@ -60,8 +81,3 @@ class ProcessAdapter:
 
     def is_running(self) -> bool:
         return bool(self.proc and self.proc.returncode is None)
-
-    def exit_code(self) -> Optional[int]:
-        if not self.proc:
-            return None
-        return self.proc.returncode
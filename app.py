@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import hmac
+import logging
+import time
+
 from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional
 
 from polarmanager.core.manager import PolarManager
-from polarmanager.core.models import Event
+from polarmanager.core.models import LocalEvent
+
+log = logging.getLogger("polarmanager.app")
 
 
 class ActionReq(BaseModel):
@@ -20,7 +28,9 @@ class PluginEventReq(BaseModel):
 
 
 def build_app(manager: PolarManager, shared_secret: Optional[str]) -> FastAPI:
-    app = FastAPI(title="PolarManager")
+    app = FastAPI(title="PolarManager", default_response_class=ORJSONResponse)
+    limiter = asyncio.Semaphore(manager.cfg.max_concurrent_plugin_events or 64)
+    rejected = 0
 
     @app.get("/v1/status")
     async def status():
@@ -52,26 +62,56 @@ def build_app(manager: PolarManager, shared_secret: Optional[str]) -> FastAPI:
             raise HTTPException(404, "unknown server_id")
         return {"ok": True}
 
-    @app.post("/v1/plugin/event")
-    async def plugin_event(
-        req: PluginEventReq,
-        x_polar_secret: Optional[str] = Header(default=None),
-    ):
-        if shared_secret:
-            if not x_polar_secret or x_polar_secret != shared_secret:
-                raise HTTPException(401, "bad secret")
+    async def enqueue_plugin_event(req: PluginEventReq) -> dict:
+        nonlocal rejected
+
+        if limiter.locked():
+            if not rejected:
+                log.warning("plugin event cap reached, rejecting with 503")
+            rejected += 1
+            raise HTTPException(503, "busy")
+
+        async with limiter:
+            thing = LocalEvent(
+                type=req.type, ts=time.time(), server_id=req.server_id, data=req.data
+            )
+            await manager.event_q.put(thing)
 
-        thing = Event(
-            type=req.type,
-            ts=(
-                manager.servers[next(iter(manager.servers))]._now()
-                if manager.servers
-                else 0.0
-            ),
-            server_id=req.server_id,
-            data=req.data,
-        )
-        await manager.event_q.put(thing)
+        # report rejections once there is room again, so the warn isn't lost
+        if rejected:
+            try:
+                manager.event_q.put_nowait(
+                    LocalEvent(
+                        type="warn",
+                        ts=time.time(),
+                        data={"msg": "plugin events rejected", "count": rejected},
+                    )
+                )
+            except asyncio.QueueFull:
+                pass
+            else:
+                log.warning("%d plugin events were rejected with 503", rejected)
+                rejected = 0
         return {"ok": True}
 
+    if shared_secret:
+        secret = shared_secret.encode()
+
+        @app.post("/v1/plugin/event")
+        async def plugin_event(
+            req: PluginEventReq,
+            x_polar_secret: Optional[str] = Header(default=None),
+        ):
+            if not x_polar_secret or not hmac.compare_digest(
+                x_polar_secret.encode(), secret
+            ):
+                raise HTTPException(401, "bad secret")
+            return await enqueue_plugin_event(req)
+
+    else:
+
+        @app.post("/v1/plugin/event")
+        async def plugin_event(req: PluginEventReq):
+            return await enqueue_plugin_event(req)
+
     return app
\ No newline at end of file
@@ -0,0 +1,16 @@
+import asyncio
+
+
+def setup_event_loop() -> None:
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def enable_eager_tasks() -> None:
+    factory = getattr(asyncio, "eager_task_factory", None)
+    if factory is None:
+        return
+    asyncio.get_running_loop().set_task_factory(factory)
@@ -2,20 +2,41 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import re
 import time
-import socket
-from typing import Dict, Optional
+from collections import deque
+from typing import Callable, Dict, List, Optional
 
 import aiohttp
 
-from .models import AppConfig, Event, HealthState, ServerConfig, ServerStatus
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from .models import AppConfig, HealthState, LocalEvent, ServerConfig, ServerStatus
 from .process_adapter import ProcessAdapter
 
 log = logging.getLogger("polarmanager.manager")
 
+_TICK_CHUNK = 8
+_RESTART_RETRY_S = 1.0
+
+# log traffic is shed once the queue passes this share of maxsize, so the
+# remaining headroom stays free for status/crash/health events
+_LOG_QUEUE_SHARE = 0.9
+_LOG_EVENTS = frozenset({"log_line", "important_log"})
+# control events wait at most this long for room; callers may hold the server lock
+_CONTROL_PUT_TIMEOUT_S = 2.0
+
 
 class ManagedServer:
-    def __init__(self, cfg: ServerConfig, event_q: "asyncio.Queue[Event]") -> None:
+    def __init__(
+        self,
+        cfg: ServerConfig,
+        event_q: "asyncio.Queue[LocalEvent]",
+        view: Optional[dict] = None,
+    ) -> None:
         self.cfg = cfg
         self.event_q = event_q
         self.proc = ProcessAdapter()
@@ -23,62 +44,129 @@ class ManagedServer:
         self.status: ServerStatus = ServerStatus.stopped
         self.health: HealthState = HealthState.ok
 
-        self._restart_times: list[float] = []
+        self._view = view if view is not None else {}
+        self._view.update(
+            name=cfg.name,
+            status=self.status.value,
+            health=self.health.value,
+            priority=cfg.priority,
+        )
+
+        self._restart_times: "deque[float]" = deque(
+            maxlen=max(cfg.max_restart_per_minute, 1)
+        )
         self._lock = asyncio.Lock()
+        self._dropped_logs = 0
+        self._dropped_control = 0
+        self._log_q_limit = int(event_q.maxsize * _LOG_QUEUE_SHARE)
+        self._watch_task: Optional[asyncio.Task] = None
+
+        self._kw_match = _build_keyword_matcher(cfg.log_important_keywords)
+
+    def _set_status(self, status: ServerStatus) -> None:
+        self.status = status
+        self._view["status"] = status.value
+
+    def _set_health(self, health: HealthState) -> None:
+        self.health = health
+        self._view["health"] = health.value
 
     def _now(self) -> float:
         return time.time()
 
     async def _emit(self, type_: str, data: dict) -> None:
-        await self.event_q.put(
-            Event(type=type_, ts=self._now(), server_id=self.cfg.id, data=data)
-        )
+        thing = LocalEvent(type_, self._now(), self.cfg.id, data)
+        if type_ not in _LOG_EVENTS:
+            try:
+                await asyncio.wait_for(
+                    self.event_q.put(thing), timeout=_CONTROL_PUT_TIMEOUT_S
+                )
+            except asyncio.TimeoutError:
+                self._dropped_control += 1
+                log.warning("event queue full, dropped %s for %s", type_, self.cfg.id)
+                return
+            self._report_drops(thing.ts)
+            return
+
+        if self._log_q_limit and self.event_q.qsize() >= self._log_q_limit:
+            self._dropped_logs += 1
+            return
+
+        self._report_drops(thing.ts)
+        try:
+            self.event_q.put_nowait(thing)
+        except asyncio.QueueFull:
+            self._dropped_logs += 1
+
+    def _report_drops(self, ts: float) -> None:
+        if not (self._dropped_logs or self._dropped_control):
+            return
+        try:
+            self.event_q.put_nowait(
+                LocalEvent(
+                    "warn",
+                    ts,
+                    self.cfg.id,
+                    {
+                        "msg": "events dropped",
+                        "log_events": self._dropped_logs,
+                        "control_events": self._dropped_control,
+                    },
+                )
+            )
+        except asyncio.QueueFull:
+            return
+        self._dropped_logs = 0
+        self._dropped_control = 0
 
     def _allow_restart(self) -> bool:
-        now = self._now()
-        minute_ago = now - 60.0
-        self._restart_times = [t for t in self._restart_times if t >= minute_ago]
+        minute_ago = time.monotonic() - 60.0
+        while self._restart_times and self._restart_times[0] < minute_ago:
+            self._restart_times.popleft()
         return len(self._restart_times) < self.cfg.max_restart_per_minute
 
     async def _on_log_line(self, line: str) -> None:
         await self._emit("log_line", {"line": line})
 
-        for kw in self.cfg.log_important_keywords:
-            if kw in line:
-                await self._emit("important_log", {"line": line, "keyword": kw})
-                break
+        kw = self._kw_match(line)
+        if kw is not None:
+            await self._emit("important_log", {"line": line, "keyword": kw})
 
     async def start(self, reason: str = "") -> None:
         async with self._lock:
             if self.proc.is_running():
                 return
-            self.status = ServerStatus.starting
+            # a watcher still waiting to auto-restart must not outlive this start
+            self._cancel_watch()
+            self._set_status(ServerStatus.starting)
             await self._emit("status", {"status": self.status.value, "reason": reason})
 
             await self.proc.start(
                 self.cfg.start_cmd, self.cfg.workdir, self.cfg.env, self._on_log_line
             )
+            self._watch_task = asyncio.create_task(self._watch_exit())
 
-            self.status = ServerStatus.running
+            self._set_status(ServerStatus.running)
             await self._emit("status", {"status": self.status.value, "reason": reason})
 
     async def stop(self, reason: str = "") -> None:
         async with self._lock:
+            self._cancel_watch()
             if not self.proc.is_running():
-                self.status = ServerStatus.stopped
+                self._set_status(ServerStatus.stopped)
                 await self._emit(
                     "status", {"status": self.status.value, "reason": reason}
                 )
                 return
 
-            self.status = ServerStatus.stopping
+            self._set_status(ServerStatus.stopping)
             await self._emit("status", {"status": self.status.value, "reason": reason})
 
             if self.cfg.stop_cmd:
                 await self._emit("info", {"msg": "stop_cmd not implemented yet"})
 
             await self.proc.stop()
-            self.status = ServerStatus.stopped
+            self._set_status(ServerStatus.stopped)
             await self._emit("status", {"status": self.status.value, "reason": reason})
 
     async def restart(self, reason: str = "") -> None:
@@ -86,91 +174,133 @@ class ManagedServer:
         await asyncio.sleep(0.2)
         await self.start(reason=reason)
 
-    async def tick_supervisor(self) -> None:
-        if self.proc.is_running():
-            return
+    def _cancel_watch(self) -> None:
+        if self._watch_task and self._watch_task is not asyncio.current_task():
+            self._watch_task.cancel()
+        self._watch_task = None
 
-        code = self.proc.exit_code()
-        if code is None:
-            return
+    async def _watch_exit(self) -> None:
+        try:
+            await self._on_exit(await self.proc.wait())
+        except Exception:
+            log.exception("supervisor failed for %s", self.cfg.id)
 
+    async def _on_exit(self, code: int) -> None:
         if code == 0:
-            self.status = ServerStatus.stopped
+            self._set_status(ServerStatus.stopped)
             return
 
-        self.status = ServerStatus.crashed
+        self._set_status(ServerStatus.crashed)
         await self._emit("crash", {"exit_code": code})
+        await self._auto_restart()
+
+    async def _auto_restart(self) -> None:
+        while self.cfg.restart_policy != "never":
+            if not self._allow_restart():
+                await self._emit("warn", {"msg": "restart rate limited"})
+                if not self._restart_times:
+                    return
+                await asyncio.sleep(
+                    max(self._restart_times[0] + 60.0 - time.monotonic(), 0.0)
+                )
+                continue
 
-        if self.cfg.restart_policy == "never":
-            return
-        if not self._allow_restart():
-            await self._emit("warn", {"msg": "restart rate limited"})
-            return
-
-        self._restart_times.append(self._now())
-        await self.start(reason="auto_restart")
+            self._restart_times.append(time.monotonic())
+            try:
+                await self.start(reason="auto_restart")
+                return
+            except Exception as e:
+                log.exception("auto restart failed for %s", self.cfg.id)
+                self._set_status(ServerStatus.crashed)
+                await self._emit("crash", {"exit_code": None, "error": str(e)})
+            await asyncio.sleep(_RESTART_RETRY_S)
 
-    async def tick_health(self) -> None:
-        ok = True
+    async def tick_health(
+        self, http: Optional[aiohttp.ClientSession] = None
+    ) -> None:
+        checks = []
 
         if self.cfg.health_port is not None:
-            ok = ok and await _check_port_open(
-                self.cfg.health_port, timeout_s=self.cfg.health_timeout_s
+            checks.append(
+                _check_port_open(
+                    self.cfg.health_port, timeout_s=self.cfg.health_timeout_s
+                )
             )
 
         if self.cfg.health_http_url:
-            ok = ok and await _check_http(
-                self.cfg.health_http_url, timeout_s=self.cfg.health_timeout_s
+            checks.append(
+                _check_http(
+                    http,
+                    self.cfg.health_http_url,
+                    timeout_s=self.cfg.health_timeout_s,
+                )
             )
 
+        ok = all(await asyncio.gather(*checks))
+
         new_state = HealthState.ok if ok else HealthState.fail
         if new_state != self.health:
-            self.health = new_state
+            self._set_health(new_state)
             await self._emit("health", {"health": self.health.value})
 
 
 class PolarManager:
     def __init__(self, cfg: AppConfig) -> None:
         self.cfg = cfg
-        self.event_q: "asyncio.Queue[Event]" = asyncio.Queue()
+        self.event_q: "asyncio.Queue[LocalEvent]" = asyncio.Queue(
+            maxsize=cfg.event_queue_max
+        )
         self.servers: Dict[str, ManagedServer] = {}
+        self._views: Dict[str, dict] = {}
 
         thing = cfg.servers[: cfg.max_servers]
         for otherThing in thing:
-            self.servers[otherThing.id] = ManagedServer(otherThing, self.event_q)
+            self._views[otherThing.id] = {}
+            self.servers[otherThing.id] = ManagedServer(
+                otherThing, self.event_q, self._views[otherThing.id]
+            )
 
         self._stop = asyncio.Event()
+        self._http: Optional[aiohttp.ClientSession] = None
 
     def stop(self) -> None:
         self._stop.set()
 
+    async def startup(self) -> None:
+        if self._http is None:
+            self._http = aiohttp.ClientSession()
+
+    async def shutdown(self) -> None:
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
     def snapshot(self) -> dict:
-        return {
-            "client_id": self.cfg.client_id,
-            "servers": {
-                sid: {
-                    "name": s.cfg.name,
-                    "status": s.status.value,
-                    "health": s.health.value,
-                    "priority": s.cfg.priority,
-                }
-                for sid, s in self.servers.items()
-            },
-        }
+        return {"client_id": self.cfg.client_id, "servers": self._views}
 
     async def start_all(self) -> None:
         for sid, s in self.servers.items():
             await s.start(reason="boot")
 
+    async def _tick(self, sid: str, s: ManagedServer) -> None:
+        try:
+            await s.tick_health(self._http)
+        except Exception:
+            log.exception("tick failed for %s", sid)
+
     async def loop(self) -> None:
-        while not self._stop.is_set():
-            for sid, s in self.servers.items():
-                try:
-                    await s.tick_supervisor()
-                    await s.tick_health()
-                except Exception:
-                    log.exception("tick failed for %s", sid)
-            await asyncio.sleep(1.0)
+        await self.startup()
+        try:
+            while not self._stop.is_set():
+                thing = list(self.servers.items())
+                for i in range(0, len(thing), _TICK_CHUNK):
+                    await asyncio.gather(
+                        *(self._tick(sid, s) for sid, s in thing[i : i + _TICK_CHUNK])
+                    )
+                    await asyncio.sleep(0)
+                await asyncio.sleep(self.cfg.health_interval_s)
+        finally:
+            await self.shutdown()
 
     async def do_action(self, server_id: str, action: str, reason: str = "") -> None:
         thing = self.servers.get(server_id)
@@ -190,25 +320,61 @@ class PolarManager:
 async def _check_port_open(
     port: int, host: str = "127.0.0.1", timeout_s: float = 1.0
 ) -> bool:
-    loop = asyncio.get_running_loop()
     try:
-        fut = loop.run_in_executor(None, _sync_port_check, host, port, timeout_s)
-        return await asyncio.wait_for(fut, timeout=timeout_s + 0.2)
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout=timeout_s
+        )
     except Exception:
         return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return True
 
 
-def _sync_port_check(host: str, port: int, timeout_s: float) -> bool:
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(timeout_s)
-        return s.connect_ex((host, port)) == 0
-
-
-async def _check_http(url: str, timeout_s: float) -> bool:
+async def _check_http(
+    session: Optional[aiohttp.ClientSession], url: str, timeout_s: float
+) -> bool:
+    timeout = aiohttp.ClientTimeout(total=timeout_s)
     try:
-        timeout = aiohttp.ClientTimeout(total=timeout_s)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url) as resp:
-                return 200 <= resp.status < 400
+        if session is None:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(url) as resp:
+                    return 200 <= resp.status < 400
+        async with session.get(url, timeout=timeout) as resp:
+            return 200 <= resp.status < 400
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+
+def _build_keyword_matcher(keywords: List[str]) -> Callable[[str], Optional[str]]:
+    keywords = [kw for kw in keywords if kw]
+    if not keywords:
+        return lambda line: None
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for i, kw in enumerate(keywords):
+            automaton.add_word(kw, (i, kw))
+        automaton.make_automaton()
+
+        # same answer as the regex: leftmost start, ties by keyword order
+        def match(line: str) -> Optional[str]:
+            hit = min(
+                automaton.iter(line),
+                key=lambda h: (h[0] - len(h[1][1]), h[1][0]),
+                default=None,
+            )
+            return hit[1][1] if hit else None
+
+        return match
+
+    pattern = re.compile("|".join(map(re.escape, keywords)))
+
+    def match(line: str) -> Optional[str]:
+        hit = pattern.search(line)
+        return hit.group(0) if hit else None
+
+    return match
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
@@ -57,6 +58,9 @@ class AppConfig(BaseModel):
     http_port: int = 8765
 
     max_servers: int = 25
+    event_queue_max: int = 10_000
+    health_interval_s: float = 5.0
+    max_concurrent_plugin_events: int = 64
 
     polarsystems: AdapterConfig = Field(default_factory=AdapterConfig)
     polarbridge: AdapterConfig = Field(default_factory=AdapterConfig)
@@ -65,8 +69,9 @@ class AppConfig(BaseModel):
     servers: List[ServerConfig] = Field(default_factory=list)
 
 
-class Event(BaseModel):
+@dataclass(slots=True, frozen=True)
+class LocalEvent:
     type: str
     ts: float
     server_id: Optional[str] = None
-    data: Dict[str, Any] = Field(default_factory=dict)
+    data: Dict[str, Any] = field(default_factory=dict)